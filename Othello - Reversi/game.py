@@ -1,14 +1,29 @@
+import os
+from collections import namedtuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from pathlib import Path
+
 import yaml
 
 from bitwise_func import set_state, cell_count, print_board, print_pieces
 from measure import profile_n, time_n  # Time measurement and Function Calls/Time Profiling
 from minmax_params import Strategy  # Enums for the strategies
-from next import generate_moves, make_move
-from strategies import strategy
+from next import make_move_n
+from next_numba import generate_moves, legal_moves_cached, make_move, random_game_u64
+from strategies import strategy, clear_transpositions
+
+CONFIG_PATH = Path(__file__).with_name("config.yaml")
+
+# Parameters of othello, in the order of its arguments : a config can be played with othello(*config)
+Config = namedtuple("Config", ["minimax_mode", "mode", "size", "max_depth", "display", "verbose", "save_moves",
+                               "workers"])
 
 
 def othello(minimax_mode: tuple, mode: tuple, size: int = 8, max_depth: int = 4,
-            display: bool = False, verbose: bool = False, save_moves: bool = False) -> tuple[int, int, int, int]:
+            display: bool = False, verbose: bool = False, save_moves: bool = False,
+            workers: int = 1) -> tuple[int, int, int, int]:
     """
     Handles the game logic of Othello. The game is played on a 8x8 board by default by two players, one with the black
     pieces (value -1) and one with the white pieces (value +1). The game starts with 2 black pieces and 2 white pieces
@@ -23,41 +38,88 @@ def othello(minimax_mode: tuple, mode: tuple, size: int = 8, max_depth: int = 4,
         display (bool, optional): display the board for the bots. Defaults to False.
         verbose (bool, optional): print the winner. Defaults to False.
         save_moves (bool, optional): save the moves as knowledge for each player (separately). Defaults to False.
+        workers (int, optional): number of processes searching the root moves in parallel. Defaults to 1.
 
     Returns:
         tuple[int, int, int]: return code, white pieces, black pieces
     """
-    error_handling(minimax_mode, mode, size)
+    assert not _validate(minimax_mode, mode, size)  # main validates the parameters once : skipped with python -O
+    if save_moves:  # The saved moves are only kept for the current game
+        legal_moves_cached.cache_clear()
+    clear_transpositions()  # The transpositions are kept between the plies of a game only
     enemy, own = init_bit_board(size)  # set the bit board : white pieces, black pieces
     turn = -1  # Black starts
 
-    nb_pieces_played = 0
+    if size == 8 and mode == (Strategy.RANDOM, Strategy.RANDOM) and not display and verbose != 2:
+        # Nothing to search, display nor print during the game : the whole game runs in the jitted kernel
+        own, enemy, turn = random_game_u64(own, enemy, turn)
+        return get_winner(own, enemy, verbose, turn), own, enemy, turn
 
-    while True:
-        if verbose == 2:
-            status(own, enemy, size, turn)
-
-        # Generate the possible moves for the current player
-        moves, directions = generate_moves(own, enemy, size)
-
-        if not moves:  # Verify if the other player can play
-            if not generate_moves(enemy, own, size)[0]:
-                break  # End the game loop : No one can play
-            own, enemy = enemy, own  # swap the players
-            turn *= -1
-            continue  # Skip the current turn as the current player can't play
-
-        # Get the next move and play it
-        next_move = strategy(minimax_mode, mode, own, enemy, moves, turn, display, size, max_depth, save_moves,
-                             nb_pieces_played)
-        enemy, own = make_move(own, enemy, next_move, directions)  # Swap the pieces after the move
-        turn *= -1
-        nb_pieces_played += 1
+    # The status of the board is only printed in verbose mode 2 : the other games run a loop without any print
+    play = _othello_verbose if verbose == 2 else _othello_silent
+    # The processes searching the root moves in parallel are kept during the game, and released at its end
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as executor:
+        own, enemy, turn = play(minimax_mode, mode, own, enemy, turn, size, max_depth, display, save_moves, executor)
 
     return get_winner(own, enemy, verbose, turn), own, enemy, turn
 
 
-def error_handling(minimax_mode: tuple, mode: tuple, size: int) -> int:
+def _othello_silent(minimax_mode: tuple, mode: tuple, own: int, enemy: int, turn: int, size: int, max_depth: int,
+                    display: bool, save_moves: bool, executor: Executor) -> tuple[int, int, int]:
+    """Play the game until its end. Returns the final (own, enemy, turn)."""
+    state = (own, enemy, turn, None, 0)
+    while True:
+        next_state = _next_turn(state, minimax_mode, mode, size, max_depth, display, save_moves, executor)
+        if next_state is None:  # No one can play
+            return state[:3]
+        state = next_state
+
+
+def _othello_verbose(minimax_mode: tuple, mode: tuple, own: int, enemy: int, turn: int, size: int, max_depth: int,
+                     display: bool, save_moves: bool, executor: Executor) -> tuple[int, int, int]:
+    """Same as _othello_silent, but print the status of the board at each turn"""
+    state = (own, enemy, turn, None, 0)
+    while True:
+        own, enemy, turn, _, _ = state
+        status(own, enemy, size, turn)
+        next_state = _next_turn(state, minimax_mode, mode, size, max_depth, display, save_moves, executor)
+        if next_state is None:  # No one can play
+            return own, enemy, turn
+        state = next_state
+
+
+def _next_turn(state: tuple, minimax_mode: tuple, mode: tuple, size: int, max_depth: int, display: bool,
+               save_moves: bool, executor: Executor) -> tuple | None:
+    """Play the turn of the current player, or pass if they can't play.
+
+    Args:
+        state (tuple): (own, enemy, turn, moves of the current player or None if not generated yet, nb_pieces_played)
+
+    Returns:
+        tuple | None: the state of the next turn, or None if no one can play
+    """
+    own, enemy, turn, moves, nb_pieces_played = state
+
+    # Generate the possible moves for the current player
+    if moves is None:
+        moves = generate_moves(own, enemy, size)
+
+    if not moves:  # Verify if the other player can play
+        moves = generate_moves(enemy, own, size)
+        if not moves:
+            return None  # End of the game : No one can play
+        # Skip the current turn as the current player can't play : swap the players, the moves of the other are kept
+        return enemy, own, -turn, moves, nb_pieces_played
+
+    # Get the next move and play it
+    next_move = strategy(minimax_mode, mode, own, enemy, moves, turn, display, size, max_depth, save_moves,
+                         nb_pieces_played, executor)
+    # Swap the pieces after the move
+    enemy, own = make_move(own, enemy, next_move) if size == 8 else make_move_n(own, enemy, next_move, size)
+    return own, enemy, -turn, None, nb_pieces_played + 1
+
+
+def _validate(minimax_mode: tuple, mode: tuple, size: int) -> int:
     """
     Check if the input parameters are correct
 
@@ -76,14 +138,17 @@ def error_handling(minimax_mode: tuple, mode: tuple, size: int) -> int:
     if not all(Strategy.MINIMAX <= m <= Strategy.NEGAMAX_ALPHA_BETA for m in minimax_mode):
         raise NotImplementedError("Invalid minimax mode")
 
-    if size != 8 and any(mode) in [Strategy.POSITIONAL_TABLE1, Strategy.POSITIONAL_TABLE2, Strategy.MIXED_TABLE1,
-                                   Strategy.MIXED_TABLE2]:
+    if size != 8 and any(m in [Strategy.POSITIONAL_TABLE1, Strategy.POSITIONAL_TABLE2, Strategy.MIXED_TABLE1,
+                               Strategy.MIXED_TABLE2] for m in mode):
         raise ValueError("Size must be 8 to use heuristic tables (TABLE1, TABLE2 are used by {2, 3, 6, 7})")
+    if size != 8 and any(m not in [Strategy.HUMAN, Strategy.RANDOM] for m in mode):
+        raise ValueError("Size must be 8 to search the moves (the search uses the 8x8 kernels)")
     return 0
 
 
+@lru_cache(maxsize=None)
 def init_bit_board(size) -> tuple[int, int]:
-    """Set the starting positions for the white and black pieces"""
+    """Set the starting positions for the white and black pieces. They only depend on the size : computed once."""
     white_pieces = set_state(0, size // 2 - 1, size // 2 - 1, size)
     white_pieces = set_state(white_pieces, size // 2, size // 2, size)
     black_pieces = set_state(0, size // 2 - 1, size // 2, size)
@@ -103,25 +168,23 @@ def get_winner(own_pieces: int, enemy_pieces: int, verbose: bool, turn: int) ->
     Returns:
         int: return code. -1 if black wins, 0 if tied, 1 if white wins
     """
-    white_pieces, black_pieces = (own_pieces, enemy_pieces) if turn == 1 else (enemy_pieces, own_pieces)
-    black = cell_count(black_pieces)
-    white = cell_count(white_pieces)
-    if black > white:
-        if verbose:
+    own, enemy = cell_count(own_pieces), cell_count(enemy_pieces)
+    diff = turn * (own - enemy)  # white - black, as white is 1 and black is -1
+    code = (diff > 0) - (diff < 0)  # sign of white - black : the return code
+    if verbose:
+        white, black = (own, enemy)[::turn]  # (own, enemy) if white is the current player, else reversed
+        if code == -1:
             print("Black wins" + "(" + str(black) + " vs " + str(white) + ")")
-        return -1
-    if black < white:
-        if verbose:
+        elif code == 1:
             print("White wins" + "(" + str(white) + " vs " + str(black) + ")")
-        return 1
-    if verbose:
-        print("Draw" + "(" + str(black) + " vs " + str(white) + ")")
-    return 0
+        else:
+            print("Draw" + "(" + str(black) + " vs " + str(white) + ")")
+    return code
 
 
 def status(own: int, enemy: int, size: int, turn: int) -> None:
     print("Turn: " + ("Black" if turn == -1 else "White"))
-    white_pieces, black_pieces = (own, enemy) if turn == 1 else (enemy, own)
+    white_pieces, black_pieces = (own, enemy)[::turn]
     print_board(white_pieces, black_pieces, size)
     print_pieces(white_pieces, size)
     print_pieces(black_pieces, size)
@@ -130,19 +193,33 @@ def status(own: int, enemy: int, size: int, turn: int) -> None:
     print(white_pieces | black_pieces)
 
 
-def main():
-    with open(f"{__file__}/../config.yaml", "r") as file:
+def load_config(path: Path = CONFIG_PATH) -> tuple[int, Config]:
+    """Read the yaml config once. Returns the number of games to play and the parameters of the games."""
+    with open(path, "r") as file:
         config = yaml.safe_load(file)
-    minimax_mode = (int(config["minimax_mode"][0]), int(config["minimax_mode"][1]))
-    mode = (int(config["mode"][0]), int(config["mode"][1]))
-    size = int(config["size"])
-    max_depth = int(config["max_depth"])
-    display = config["display"]
-    verbose = config["verbose"]
-    save_moves = config["save_moves"]
-
-    time_n(othello, config["n"], (minimax_mode, mode, size, max_depth, display, verbose, save_moves))
-    profile_n(othello, config["n"], (minimax_mode, mode, size, max_depth, display, verbose, save_moves))
+    return int(config["n"]), Config(
+        minimax_mode=(int(config["minimax_mode"][0]), int(config["minimax_mode"][1])),
+        mode=(int(config["mode"][0]), int(config["mode"][1])),
+        size=int(config["size"]),
+        max_depth=int(config["max_depth"]),
+        display=config["display"],
+        verbose=config["verbose"],
+        save_moves=config["save_moves"],
+        workers=int(config["workers"]),
+    )
+
+
+def main():
+    n, config = load_config()
+    _validate(config.minimax_mode, config.mode, config.size)  # Once for all the games
+
+    # The games are played in parallel, unless a human plays, the board is displayed or printed at each turn, or the
+    # search is already parallel
+    sequential = config.display or config.verbose == 2 or Strategy.HUMAN in config.mode or config.workers > 1
+    processes = 1 if sequential else os.cpu_count()
+
+    time_n(othello, n, config, processes)
+    profile_n(othello, n, config, processes)
 
 
 if __name__ == "__main__":
@@ -1,18 +1,36 @@
 import cProfile
+import os
 import pstats
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 from tqdm import tqdm
 
 
-def profile_n(func, n: int, params: tuple) -> None:
+def profile_n(func, n: int, params: tuple, processes: int = 1) -> None:
     """Profile the code
 
     Args:
         func (function): function to profile
         n (int): number of iterations
         params (tuple): parameters of the game
+        processes (int, optional): number of processes playing the games. Defaults to 1.
     """
+    if processes > 1 and n >= 4:  # Profile a share of the games in each process and merge the statistics
+        processes = min(processes, n)
+        shares = [n // processes + (i < n % processes) for i in range(processes)]
+        with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(max_workers=processes) as executor:
+            paths = [os.path.join(directory, f"profile_{i}.prof") for i in range(processes)]
+            list(tqdm(executor.map(partial(profile_games, func, params), shares, paths), total=processes,
+                      desc="Progress", unit="process"))
+            ps = pstats.Stats(paths[0])
+            ps.add(*paths[1:])
+        ps.sort_stats('cumulative')
+        ps.print_stats()
+        return
+
     # code, board, moves, adj_cells = func(*params)
     # profile n calls
     pr = cProfile.Profile()
@@ -25,22 +43,33 @@ def profile_n(func, n: int, params: tuple) -> None:
     ps.print_stats()
 
 
-def time_n(func, n: int, params: tuple) -> None:
+def time_n(func, n: int, params: tuple, processes: int = 1) -> None:
     """Time the code
 
     Args:
         func (function): function to time
         n (int): number of iterations
         params (tuple): parameters of the game
+        processes (int, optional): number of processes playing the games. Defaults to 1.
     """
     wins = []
     onsets = []
     offsets = []
-    for _ in tqdm(range(n), desc="Progress", unit="iteration"):
+    if processes > 1 and n >= 4:  # The games are independent : play them in parallel and time them all together
         onsets.append(time.perf_counter())
-        code, own, enemy, turn = func(*params)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            # Send the games by chunks : a game can take less time than its transfer between the processes
+            for code in tqdm(executor.map(partial(play_game, func, params), range(n),
+                                          chunksize=max(1, n // (4 * processes))),
+                             total=n, desc="Progress", unit="iteration"):
+                wins.append(code)
         offsets.append(time.perf_counter())
-        wins.append(code)
+    else:
+        for _ in tqdm(range(n), desc="Progress", unit="iteration"):
+            onsets.append(time.perf_counter())
+            code, own, enemy, turn = func(*params)
+            offsets.append(time.perf_counter())
+            wins.append(code)
 
     print("\nTime:", offsets[-1] - onsets[0])
     if n > 1:
@@ -48,3 +77,18 @@ def time_n(func, n: int, params: tuple) -> None:
         print("Black won:", wins.count(-1), '(' + str(wins.count(-1) / n * 100) + '%)')
         print("White won:", wins.count(1), '(' + str(wins.count(1) / n * 100) + '%)')
         print("Draw:", wins.count(0), '(' + str(wins.count(0) / n * 100) + '%)')
+
+
+def play_game(func, params: tuple, _) -> int:
+    """Play a game in a worker process and return its code"""
+    return func(*params)[0]
+
+
+def profile_games(func, params: tuple, n: int, path: str) -> None:
+    """Profile n games in a worker process and write the statistics to the file at path"""
+    pr = cProfile.Profile()
+    pr.enable()
+    for _ in range(n):
+        func(*params)
+    pr.disable()
+    pr.dump_stats(path)
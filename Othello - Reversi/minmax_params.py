@@ -1,34 +1,46 @@
-import numpy as np
-
 MAX_INT = 100000
 
-TABLE1 = np.array(
-    [
-        500, -150, 30, 10, 10, 30, -150, 500,
-        -150, -250, 0, 0, 0, 0, -250, -150,
-        30, 0, 1, 2, 2, 1, 0, 30,
-        10, 0, 2, 16, 16, 2, 0, 10,
-        10, 0, 2, 16, 16, 2, 0, 10,
-        30, 0, 1, 2, 2, 1, 0, 30,
-        -150, -250, 0, 0, 0, 0, -250, -150,
-        500, -150, 30, 10, 10, 30, -150, 500
-    ]
+# Maximum number of entries in the transposition table
+TT_MAX_SIZE = 1 << 20
+# Flags of the transposition table entries : the stored value is exact, a lower bound or an upper bound
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+TABLE1 = (
+    500, -150, 30, 10, 10, 30, -150, 500,
+    -150, -250, 0, 0, 0, 0, -250, -150,
+    30, 0, 1, 2, 2, 1, 0, 30,
+    10, 0, 2, 16, 16, 2, 0, 10,
+    10, 0, 2, 16, 16, 2, 0, 10,
+    30, 0, 1, 2, 2, 1, 0, 30,
+    -150, -250, 0, 0, 0, 0, -250, -150,
+    500, -150, 30, 10, 10, 30, -150, 500
 )
 
-TABLE2 = np.array(
-    [
-        100, -20, 10, 5, 5, 10, -20, 100,
-        -20, -50, -2, -2, -2, -2, -50, -20,
-        10, -2, -1, -1, -1, -1, -2, 10,
-        5, -2, -1, -1, -1, -1, -2, 5,
-        5, -2, -1, -1, -1, -1, -2, 5,
-        10, -2, -1, -1, -1, -1, -2, 10,
-        -20, -50, -2, 2, -2, -2, -50, -20,
-        100, -20, 10, 5, 5, 10, -20, 100
-    ]
+TABLE2 = (
+    100, -20, 10, 5, 5, 10, -20, 100,
+    -20, -50, -2, -2, -2, -2, -50, -20,
+    10, -2, -1, -1, -1, -1, -2, 10,
+    5, -2, -1, -1, -1, -1, -2, 5,
+    5, -2, -1, -1, -1, -1, -2, 5,
+    10, -2, -1, -1, -1, -1, -2, 10,
+    -20, -50, -2, 2, -2, -2, -50, -20,
+    100, -20, 10, 5, 5, 10, -20, 100
 )
 
 
+def row_sums(table: tuple, size: int = 8) -> tuple:
+    """Return, for each row of the table, the sums of the values for every possible occupancy of the row"""
+    return tuple(tuple(sum(table[i * size + j] for j in range(size) if occupancy & (1 << j))
+                       for occupancy in range(1 << size)) for i in range(size))
+
+
+# Row sums of the tables, used by the positional heuristic to sum the values of a row (byte) of a bit board at once
+TABLE1_ROWS = row_sums(TABLE1)
+TABLE2_ROWS = row_sums(TABLE2)
+
+
 # Enums for the strategies
 class Strategy:
     # Minimax algorithms
@@ -1,93 +1,69 @@
-def generate_moves(own, enemy, size) -> tuple[list, dict]:
-    """Generate the possible moves for the current player using bitwise operations"""
-    empty = ~(own | enemy)  # Empty squares (not owned by either player)
-    unique_moves = []  # List of possible moves
-    dir_jump = {}  # Dictionary of moves and the number of pieces that can be captured in each direction
-
-    # Generate moves in all eight directions
-    for direction in [north, south, east, west, north_west, north_east, south_west, south_east]:
-        # We get the pieces that are next to an enemy piece in the direction
-        count = 0
-        victims = direction(own) & enemy
-        if not victims:
-            continue
-
-        # We keep getting the pieces that are next to an enemy piece in the direction
-        for _ in range(size):
-            count += 1
-            next_piece = direction(victims) & enemy
-            if not next_piece:
-                break
-            victims |= next_piece
-
-        # We get the pieces that can be captured in the direction
-        captures = direction(victims) & empty
-        # if there are multiple pieces in captures, we separate them and add them to the set
-        while captures:
-            capture = captures & -captures  # get the least significant bit
-            captures ^= capture  # remove the lsb
-            if capture not in dir_jump:
-                unique_moves.append(capture)
-                dir_jump[capture] = []
-            dir_jump[capture].append((direction, count))
-
-    return unique_moves, dir_jump
-
-
-def make_move(own, enemy, move_to_play, directions):
-    """Make the move and update the board using bitwise operations."""
-    for direction, count in directions[move_to_play]:
-        victims = move_to_play  # Init the victims with the move to play
-
-        op_dir = opposite_dir(direction)  # opposite direction since we go from the move to play to the captured pieces
-        for _ in range(count):
-            victims |= (op_dir(victims) & enemy)
-        own ^= victims
-        enemy ^= victims & ~move_to_play
-    # because of the XOR, the move to play which is considered a victim can be returned a pair number of times
-    own |= move_to_play
-    return own, enemy
+from functools import lru_cache
+
+
+# ------------------------------------ ANY SIZE ------------------------------------ #
+# Move generation on Python ints, used for the boards other than 8x8 (the 8x8 board uses the kernels of next_numba)
+def generate_moves_n(own, enemy, size) -> list:
+    """Generate the possible moves for the current player on a board of any size"""
+    _, full = directions_n(size)[0]  # The vertical directions are not masked : their mask is the full board
+    empty = ~(own | enemy) & full
+    legal = 0
+    for shift, mask in directions_n(size):
+        legal |= shift_board(fill_n(own, enemy & mask, shift, size) ^ own, shift)
+    legal &= empty
+
+    unique_moves = []
+    while legal:
+        move = legal & -legal  # get the least significant bit
+        legal ^= move  # remove the lsb
+        unique_moves.append(move)
+    return unique_moves
+
+
+def make_move_n(own, enemy, move_to_play, size):
+    """Make the move and update the board of any size. A line is captured if the fill from the move through the
+    enemy pieces is closed by an own piece."""
+    flipped = 0
+    for shift, mask in directions_n(size):
+        line = fill_n(move_to_play, enemy & mask, shift, size)
+        if shift_board(line, shift) & own:
+            flipped |= line ^ move_to_play
+    return own ^ flipped | move_to_play, enemy ^ flipped
+
+
+@lru_cache(maxsize=None)
+def directions_n(size) -> tuple:
+    """Return the shift and mask of each direction for a board of any size. A positive shift goes towards the most
+    significant bits (left shift)."""
+    full = (1 << size * size) - 1
+    inner = 0  # All the cells except the first and last columns
+    for row in range(size):
+        inner |= ((1 << size - 2) - 1) << (row * size + 1)
+    return (
+        (-size, full),  # north
+        (size, full),  # south
+        (1, inner),  # east
+        (-1, inner),  # west
+        (-size - 1, inner),  # north_west
+        (size + 1, inner),  # south_east
+        (-size + 1, inner),  # north_east
+        (size - 1, inner),  # south_west
+    )
+
+
+def fill_n(gen, pro, shift, size):
+    """Kogge-Stone fill with as many doublings as needed to cover the size - 2 cells of a line of captured pieces"""
+    covered = 0
+    while True:
+        gen |= pro & shift_board(gen, shift)
+        covered = 2 * covered + 1
+        if covered >= size - 2:
+            return gen
+        pro &= shift_board(pro, shift)
+        shift *= 2
 
 
 # ------------------------------------ DIRECTIONS ------------------------------------ #
-# Orthogonal directions
-def north(x):
-    return x >> 8
-
-
-def south(x):
-    return (x & 0x00ffffffffffffff) << 8
-
-
-def east(x):
-    return (x & 0x7f7f7f7f7f7f7f7f) << 1
-
-
-def west(x):
-    return (x & 0xfefefefefefefefe) >> 1
-
-
-# Diagonal directions
-def north_west(x):
-    return north(west(x))
-
-
-def north_east(x):
-    return north(east(x))
-
-
-def south_west(x):
-    return south(west(x))
-
-
-def south_east(x):
-    return south(east(x))
-
-
-opposite_direction = {north: south, south: north, east: west, west: east, north_west: south_east,
-                      north_east: south_west,
-                      south_west: north_east, south_east: north_west}
-
-
-def opposite_dir(direction):
-    return opposite_direction[direction]
\ No newline at end of file
+def shift_board(x, shift):
+    """Shift the bit board in a direction. Bits going out of the board are not removed by a left shift."""
+    return x << shift if shift > 0 else x >> -shift
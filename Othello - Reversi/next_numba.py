@@ -0,0 +1,211 @@
+from functools import lru_cache
+
+import numpy as np
+from numba import njit, uint64, int64
+from numba.extending import intrinsic
+from numba.types import UniTuple, Tuple
+
+from next import generate_moves_n
+
+FULL_MASK = np.uint64(0xffffffffffffffff)  # All the 64 cells of the board
+INNER_MASK = np.uint64(0x7e7e7e7e7e7e7e7e)  # All the cells except the first and last columns
+
+FULL_BOARD = 0xffffffffffffffff  # Python int version of FULL_MASK, to compare the occupancy without a cast
+
+# Shifts of the directions, declared as uint64 so that numba never promotes the bit boards to another type
+VERTICAL = np.uint64(8)  # north (right shift) / south (left shift)
+HORIZONTAL = np.uint64(1)  # west (right shift) / east (left shift)
+ANTI_DIAGONAL = np.uint64(7)  # north_east (right shift) / south_west (left shift)
+DIAGONAL = np.uint64(9)  # north_west (right shift) / south_east (left shift)
+
+# Zobrist keys : one random key per square and color (0: black, 1: white), and one for the turn of black.
+# The seed is fixed since the keys are compiled as constants in the cached kernels.
+_rng = np.random.default_rng(2024)
+ZOBRIST = _rng.integers(0, FULL_MASK, size=(64, 2), dtype=np.uint64, endpoint=True)
+ZOBRIST_FLIP = ZOBRIST[:, 0] ^ ZOBRIST[:, 1]  # Key to XOR when a piece changes color
+ZOBRIST_TURN = np.uint64(_rng.integers(0, FULL_MASK, dtype=np.uint64, endpoint=True))
+
+
+def generate_moves(own, enemy, size) -> list:
+    """Generate the possible moves for the current player using the jitted kernel. The kernels are specialized for
+    the 8x8 board : the other sizes use the generic Python version."""
+    if size != 8:
+        return generate_moves_n(own, enemy, size)
+    if own | enemy == FULL_BOARD:  # No empty cell left : no need to call the kernel
+        return []
+    legal = legal_moves_u64(own, enemy)
+    unique_moves = []
+    while legal:
+        move = legal & -legal  # get the least significant bit
+        legal ^= move  # remove the lsb
+        unique_moves.append(move)
+    return unique_moves
+
+
+def legal_moves(own, enemy) -> int:
+    """Return the bit board of all the possible moves for the current player"""
+    return legal_moves_u64(own, enemy)
+
+
+@lru_cache(maxsize=1 << 20)
+def legal_moves_cached(own, enemy) -> int:
+    """Memoized version of legal_moves, used when the moves are saved"""
+    return legal_moves_u64(own, enemy)
+
+
+def make_move(own, enemy, move_to_play):
+    """Make the move and update the board using the jitted kernel, which finds the captured lines by itself.
+    The kernel already returns a new tuple of Python ints : it is returned as is, without any copy."""
+    return make_move_u64(own, enemy, move_to_play)
+
+
+def zobrist_hash(own, enemy, turn) -> int:
+    """Return the Zobrist key of the position"""
+    return zobrist_hash_u64(own, enemy, turn)
+
+
+def make_move_zobrist(own, enemy, move_to_play, key, turn):
+    """Make the move and update the Zobrist key of the position incrementally. Returns (own, enemy, key)."""
+    return make_move_zobrist_u64(own, enemy, move_to_play, key, turn)
+
+
+# ------------------------------------ KERNELS ------------------------------------ #
+@njit(uint64(uint64, uint64, uint64), cache=True, nogil=True, fastmath=False)
+def fill_left(gen, pro, shift):
+    """Propagate the generator bits through the propagator bits towards the most significant bits (Kogge-Stone)"""
+    gen |= pro & (gen << shift)
+    pro &= pro << shift
+    shift += shift
+    gen |= pro & (gen << shift)
+    pro &= pro << shift
+    shift += shift
+    gen |= pro & (gen << shift)
+    return gen
+
+
+@njit(uint64(uint64, uint64, uint64), cache=True, nogil=True, fastmath=False)
+def fill_right(gen, pro, shift):
+    """Propagate the generator bits through the propagator bits towards the least significant bits (Kogge-Stone)"""
+    gen |= pro & (gen >> shift)
+    pro &= pro >> shift
+    shift += shift
+    gen |= pro & (gen >> shift)
+    pro &= pro >> shift
+    shift += shift
+    gen |= pro & (gen >> shift)
+    return gen
+
+
+@njit(uint64(uint64, uint64), cache=True, nogil=True, fastmath=False)
+def legal_moves_u64(own, enemy):
+    """Return the bit board of all the possible moves for the current player"""
+    empty = ~(own | enemy)
+    inner = enemy & INNER_MASK
+
+    moves = (fill_left(own, enemy, VERTICAL) ^ own) << VERTICAL
+    moves |= (fill_right(own, enemy, VERTICAL) ^ own) >> VERTICAL
+    moves |= (fill_left(own, inner, HORIZONTAL) ^ own) << HORIZONTAL
+    moves |= (fill_right(own, inner, HORIZONTAL) ^ own) >> HORIZONTAL
+    moves |= (fill_left(own, inner, ANTI_DIAGONAL) ^ own) << ANTI_DIAGONAL
+    moves |= (fill_right(own, inner, ANTI_DIAGONAL) ^ own) >> ANTI_DIAGONAL
+    moves |= (fill_left(own, inner, DIAGONAL) ^ own) << DIAGONAL
+    moves |= (fill_right(own, inner, DIAGONAL) ^ own) >> DIAGONAL
+    return moves & empty
+
+
+@njit(uint64(uint64, uint64, uint64, uint64, uint64), cache=True, nogil=True, fastmath=False)
+def flips_left(own, pro, move, shift, flipped):
+    """Add to flipped the enemy pieces captured by the move towards the most significant bits"""
+    line = fill_left(move, pro, shift)
+    if (line << shift) & own:  # The line of enemy pieces is closed by an own piece
+        flipped |= line ^ move
+    return flipped
+
+
+@njit(uint64(uint64, uint64, uint64, uint64, uint64), cache=True, nogil=True, fastmath=False)
+def flips_right(own, pro, move, shift, flipped):
+    """Add to flipped the enemy pieces captured by the move towards the least significant bits"""
+    line = fill_right(move, pro, shift)
+    if (line >> shift) & own:  # The line of enemy pieces is closed by an own piece
+        flipped |= line ^ move
+    return flipped
+
+
+@njit(UniTuple(uint64, 2)(uint64, uint64, uint64), cache=True, nogil=True, fastmath=False)
+def make_move_u64(own, enemy, move):
+    """Make the move and return the updated bit boards (own, enemy)"""
+    inner = enemy & INNER_MASK
+    flipped = np.uint64(0)
+    flipped = flips_left(own, enemy, move, VERTICAL, flipped)
+    flipped = flips_right(own, enemy, move, VERTICAL, flipped)
+    flipped = flips_left(own, inner, move, HORIZONTAL, flipped)
+    flipped = flips_right(own, inner, move, HORIZONTAL, flipped)
+    flipped = flips_left(own, inner, move, ANTI_DIAGONAL, flipped)
+    flipped = flips_right(own, inner, move, ANTI_DIAGONAL, flipped)
+    flipped = flips_left(own, inner, move, DIAGONAL, flipped)
+    flipped = flips_right(own, inner, move, DIAGONAL, flipped)
+    return own ^ flipped | move, enemy ^ flipped
+
+
+@intrinsic
+def popcount(typingctx, x):
+    """Count the set bits with LLVM's ctpop, which is lowered to a single popcnt instruction when available"""
+    def codegen(context, builder, signature, args):
+        return builder.ctpop(args[0])  # i64 -> i64 : no cast needed
+    return int64(uint64), codegen
+
+
+@njit(int64(uint64), cache=True, nogil=True, fastmath=False)
+def cell_count_u64(x):
+    """Count the number of pieces on the bit board"""
+    return popcount(x)
+
+
+@njit(uint64(uint64, uint64, int64), cache=True, nogil=True, fastmath=False)
+def zobrist_hash_u64(own, enemy, turn):
+    """Return the XOR of the keys of every piece, and of the turn key if black is to play"""
+    color = (turn + 1) >> 1  # 0: black, 1: white
+    key = ZOBRIST_TURN if turn == -1 else np.uint64(0)
+    while own:
+        bit = own & (~own + np.uint64(1))  # get the least significant bit
+        own ^= bit  # remove the lsb
+        key ^= ZOBRIST[popcount(bit - np.uint64(1)), color]  # The index of the bit is the number of bits below it
+    while enemy:
+        bit = enemy & (~enemy + np.uint64(1))
+        enemy ^= bit
+        key ^= ZOBRIST[popcount(bit - np.uint64(1)), 1 - color]
+    return key
+
+
+@njit(UniTuple(uint64, 3)(uint64, uint64, uint64, uint64, int64), cache=True, nogil=True, fastmath=False)
+def make_move_zobrist_u64(own, enemy, move, key, turn):
+    """Make the move and return the updated bit boards (own, enemy) and Zobrist key"""
+    new_own, new_enemy = make_move_u64(own, enemy, move)
+    flipped = enemy ^ new_enemy
+    key ^= ZOBRIST_TURN  # The other player is to play
+    key ^= ZOBRIST[popcount(move - np.uint64(1)), (turn + 1) >> 1]  # The new piece
+    while flipped:  # Only the flipped pieces change color
+        bit = flipped & (~flipped + np.uint64(1))  # get the least significant bit
+        flipped ^= bit  # remove the lsb
+        key ^= ZOBRIST_FLIP[popcount(bit - np.uint64(1))]
+    return new_own, new_enemy, key
+
+
+@njit(Tuple((uint64, uint64, int64))(uint64, uint64, int64), cache=True, nogil=True, fastmath=False)
+def random_game_u64(own, enemy, turn):
+    """Play the game until its end with a random move for both players. Returns the final (own, enemy, turn)."""
+    legal = legal_moves_u64(own, enemy)
+    while True:
+        if not legal:  # Verify if the other player can play
+            legal = legal_moves_u64(enemy, own)
+            if not legal:
+                break  # No one can play
+            own, enemy = enemy, own  # swap the players, their moves are already generated
+            turn = -turn
+        for _ in range(np.random.randint(0, cell_count_u64(legal))):  # Drop the lsb of the moves until the chosen one
+            legal &= legal - np.uint64(1)
+        move = legal & (~legal + np.uint64(1))  # get the least significant bit
+        enemy, own = make_move_u64(own, enemy, move)  # Swap the pieces after the move
+        turn = -turn
+        legal = legal_moves_u64(own, enemy)
+    return own, enemy, turn
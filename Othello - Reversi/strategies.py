@@ -1,15 +1,22 @@
 import random
+from concurrent.futures import Executor
 
 from heuristics import positional, mobility, absolute
-from minmax_params import TABLE1, TABLE2, MAX_INT, Strategy
-from next import generate_moves, make_move
+from minmax_params import TABLE1_ROWS, TABLE2_ROWS, MAX_INT, Strategy, TT_MAX_SIZE, EXACT, LOWER_BOUND, UPPER_BOUND
+from next_numba import legal_moves, legal_moves_cached, make_move, make_move_zobrist, zobrist_hash
 from visualize import cv2_display
 
 MAX_DEPTH = 0
 
+# Transposition table : Zobrist key of (own pieces, enemy pieces, turn) -> (value, remaining depth, flag, best move)
+transposition_table = {}
+# Transposition tables kept between the plies of a game, one for each (heuristic, table) since the values depend on it
+transposition_tables = {}
+
 
 def strategy(minimax_mode: tuple, mode: tuple, own_pieces: int, enemy_pieces: int, moves: list, turn: int,
-             display: bool, size: int, max_depth: int, save_moves: bool, nb_pieces_played) -> int:
+             display: bool, size: int, max_depth: int, save_moves: bool, nb_pieces_played: int,
+             executor: Executor = None) -> int:
     """Return the next move based on the strategy.
 
     Args:
@@ -24,11 +31,12 @@ def strategy(minimax_mode: tuple, mode: tuple, own_pieces: int, enemy_pieces: in
         max_depth (int): max depth of the search.
         save_moves (bool): save the moves as knowledge for each player (separately).
         nb_pieces_played (int): number of pieces played.
+        executor (Executor, optional): pool of processes searching the root moves in parallel. Defaults to None.
 
     Returns:
         tuple: next move
     """
-    global MAX_DEPTH
+    global MAX_DEPTH, transposition_table
     MAX_DEPTH = max_depth
 
     if display:  # Display the board using OpenCV
@@ -48,15 +56,85 @@ def strategy(minimax_mode: tuple, mode: tuple, own_pieces: int, enemy_pieces: in
     func_to_use = which_minimax(minimax_func)  # Get the minimax function to use
 
     # Define which table to use, table 1 or 2, or we don't care (for absolute, mobility and mixed) as it won't be used
-    table_to_use = TABLE1 if player == Strategy.POSITIONAL_TABLE1 or player == Strategy.MIXED_TABLE1 else TABLE2
+    # The positional heuristic reads the tables by their row sums
+    table_to_use = TABLE1_ROWS if player in (Strategy.POSITIONAL_TABLE1, Strategy.MIXED_TABLE1) else TABLE2_ROWS
 
     # Define which heuristic to use
     heuristic_to_use = which_heuristic(player, nb_pieces_played)
 
+    # The stored values depend on the heuristic and the table : use the table of the previous plies searched with them
+    transposition_table = transposition_tables.setdefault((heuristic_to_use, table_to_use is TABLE1_ROWS), {})
+
+    # The subtrees of the root moves are independent : search them in parallel
+    if executor is not None and len(moves) > 1:
+        return parallel_search(func_to_use, own_pieces, enemy_pieces, moves, turn, size, max_depth, heuristic_to_use,
+                               table_to_use, save_moves, executor)
+
+    # The transposition table is kept between the iterations : search iteratively deeper with a good move ordering
+    if func_to_use == negamax_alpha_beta:
+        return iterative_deepening(func_to_use, own_pieces, enemy_pieces, turn, size, max_depth, heuristic_to_use,
+                                   table_to_use, save_moves)
+
     return func_to_use(own_pieces, enemy_pieces, turn, 0, size, -MAX_INT, MAX_INT,
                        heuristic=heuristic_to_use, table=table_to_use, save_moves=save_moves)[1]
 
 
+def clear_transpositions() -> None:
+    """Forget the positions searched during the previous game"""
+    transposition_tables.clear()
+    transposition_table.clear()
+
+
+def iterative_deepening(func_to_use: callable, own_pieces: int, enemy_pieces: int, turn: int, size: int,
+                        max_depth: int, heuristic: callable, table, save_moves: bool) -> int:
+    """Search with a max depth going from 1 to max_depth. The best move found at a depth is searched first at the
+    next depth (principal variation), which makes the pruning more efficient."""
+    global MAX_DEPTH
+    best_move = None
+    for depth in range(1, max_depth + 1):
+        MAX_DEPTH = depth
+        best_move = func_to_use(own_pieces, enemy_pieces, turn, 0, size, -MAX_INT, MAX_INT, heuristic=heuristic,
+                                table=table, save_moves=save_moves, pv_hint=best_move)[1]
+    return best_move
+
+
+def parallel_search(func_to_use: callable, own_pieces: int, enemy_pieces: int, moves: list, turn: int, size: int,
+                    max_depth: int, heuristic: callable, table, save_moves: bool, executor: Executor) -> int:
+    """Search the subtree of each root move in a separate process and return the best move.
+    The subtrees are searched with the full window : the pruning is not shared between the processes."""
+    tasks = []
+    for move in moves:
+        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move)  # play and swap
+        tasks.append((func_to_use, new_own_pieces, new_enemy_pieces, -turn, size, max_depth, heuristic, table,
+                      save_moves))
+    sign = -1 if func_to_use == negamax or func_to_use == negamax_alpha_beta else 1  # negamax values are negated
+
+    best = -MAX_INT
+    best_move = None
+    ties = 0
+    for move, value in zip(moves, executor.map(search_subtree, tasks)):
+        score = sign * value
+        if score > best:
+            best = score
+            best_move = move
+            ties = 1
+        elif score == best:  # Keep one of the tied moves with a uniform probability (reservoir sampling)
+            ties += 1
+            if random.random() * ties < 1:
+                best_move = move
+    return best_move
+
+
+def search_subtree(task: tuple) -> int:
+    """Search the position after a root move (at depth 1) in a worker process and return its value"""
+    global MAX_DEPTH
+    func_to_use, own_pieces, enemy_pieces, turn, size, max_depth, heuristic, table, save_moves = task
+    MAX_DEPTH = max_depth
+    transposition_table.clear()
+    return func_to_use(own_pieces, enemy_pieces, turn, 1, size, -MAX_INT, MAX_INT, heuristic=heuristic, table=table,
+                       save_moves=save_moves)[0]
+
+
 def which_mode(mode: tuple, minimax_mode: tuple, turn: int) -> tuple:
     """Return the player type and the minimax version to use based on the turn"""
     if turn == 1:
@@ -80,7 +158,7 @@ def which_minimax(minimax_func: int) -> callable:
     return func_to_use
 
 
-def which_heuristic(player: int, nb_pieces_played) -> callable:
+def which_heuristic(player: int, nb_pieces_played: int) -> callable:
     """Return the heuristic function to use based on the player type"""
     if player == Strategy.POSITIONAL_TABLE1 or player == Strategy.POSITIONAL_TABLE2:
         heuristic_to_use = positional
@@ -93,7 +171,7 @@ def which_heuristic(player: int, nb_pieces_played) -> callable:
     return heuristic_to_use
 
 
-def mixed_heuristic(nb_pieces_played) -> callable:
+def mixed_heuristic(nb_pieces_played: int) -> callable:
     """Return the heuristic function to use based on the number of pieces played"""
     if nb_pieces_played < 15:
         return positional
@@ -113,30 +191,30 @@ def minimax(own_pieces: int, enemy_pieces: int, turn: int, depth: int, size: int
     # End of the recursion : Max depth reached or no more possible moves
     if depth == MAX_DEPTH:
         return heuristic(own_pieces, enemy_pieces, size, table), None
-    moves, directions = generate_moves(own_pieces, enemy_pieces, size)
-    if not moves:
+    # Bit board of the possible moves : each move is extracted only when it is searched
+    legal = legal_moves_cached(own_pieces, enemy_pieces) if save_moves else legal_moves(own_pieces, enemy_pieces)
+    if not legal:
         return heuristic(own_pieces, enemy_pieces, size, table), None
 
     best = -MAX_INT if depth % 2 == 0 else MAX_INT
-    best_move = []
-    for move in moves:
-        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move, directions)  # play and swap
+    best_move = None
+    ties = 0  # Number of moves with the best score
+    while legal:
+        move = legal & -legal  # get the least significant bit
+        legal ^= move  # remove the lsb
+        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move)  # play and swap
         score = minimax(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, alpha, beta, heuristic, table,
                         save_moves)[0]
 
-        if depth % 2 == 0:
-            if score > best:
-                best = score
-                best_move = [move]
-            elif score == best:
-                best_move.append(move)
-        else:
-            if score < best:
-                best = score
-                best_move = [move]
-            elif score == best:
-                best_move.append(move)
-    return best, random.choice(best_move)
+        if score == best:  # Keep one of the tied moves with a uniform probability (reservoir sampling)
+            ties += 1
+            if random.random() * ties < 1:
+                best_move = move
+        elif (score > best) if depth % 2 == 0 else (score < best):
+            best = score
+            best_move = move
+            ties = 1
+    return best, best_move
 
 
 def minimax_alpha_beta(own_pieces: int, enemy_pieces: int, turn: int, depth: int, size: int, alpha: int, beta: int,
@@ -145,37 +223,48 @@ def minimax_alpha_beta(own_pieces: int, enemy_pieces: int, turn: int, depth: int
     # End of the recursion : Max depth reached or no more possible moves
     if depth == MAX_DEPTH:
         return heuristic(own_pieces, enemy_pieces, size, table), None
-    moves, directions = generate_moves(own_pieces, enemy_pieces, size)
-    if not moves:
+    # Bit board of the possible moves : each move is extracted only when it is searched
+    legal = legal_moves_cached(own_pieces, enemy_pieces) if save_moves else legal_moves(own_pieces, enemy_pieces)
+    if not legal:
         return heuristic(own_pieces, enemy_pieces, size, table), None
 
+    # A child cut off by the window (alpha, beta) only returns a bound equal to alpha. At the root, where a move tied
+    # with the best one can be chosen, the window is widened by one so that a score equal to alpha is exact.
+    tie_margin = 1 if depth == 0 else 0
     best = -MAX_INT if depth % 2 == 0 else MAX_INT
-    best_move = []
-    for move in moves:
+    best_move = None
+    ties = 0  # Number of moves with the best score
+    while legal:
+        move = legal & -legal  # get the least significant bit
+        legal ^= move  # remove the lsb
         # Compute next move and score
-        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move, directions)  # play and swap
-        score = minimax_alpha_beta(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, alpha, beta, heuristic,
-                                   table, save_moves)[0]
+        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move)  # play and swap
+        score = minimax_alpha_beta(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, alpha - tie_margin, beta,
+                                   heuristic, table, save_moves)[0]
 
         # Update best score and best move
-        if score == best:
-            best_move.append(move)
+        if score == best:  # Keep one of the tied moves with a uniform probability (reservoir sampling)
+            ties += 1
+            if random.random() * ties < 1:
+                best_move = move
         else:
             if depth % 2 == 0:
                 if score > best:
                     best = score
-                    best_move = [move]
+                    best_move = move
+                    ties = 1
                 alpha = max(alpha, best)  # Prune if possible
                 if alpha >= beta:
                     break
             else:
                 if score < best:
                     best = score
-                    best_move = [move]
+                    best_move = move
+                    ties = 1
                 beta = min(beta, best)  # Prune if possible
                 if alpha >= beta:
                     break
-    return best, random.choice(best_move)
+    return best, best_move
 
 
 def negamax(own_pieces: int, enemy_pieces: int, turn: int, depth: int, size: int, alpha: int, beta: int,
@@ -184,49 +273,129 @@ def negamax(own_pieces: int, enemy_pieces: int, turn: int, depth: int, size: int
     # End of the recursion : Max depth reached or no more possible moves
     if depth == MAX_DEPTH:
         return heuristic(own_pieces, enemy_pieces, size, table), None
-    moves, directions = generate_moves(own_pieces, enemy_pieces, size)
-    if not moves:
+    # Bit board of the possible moves : each move is extracted only when it is searched
+    legal = legal_moves_cached(own_pieces, enemy_pieces) if save_moves else legal_moves(own_pieces, enemy_pieces)
+    if not legal:
         return heuristic(own_pieces, enemy_pieces, size, table), None
 
+    leaf_children = depth + 1 == MAX_DEPTH  # The children are at the frontier of the search
     best = -MAX_INT
-    best_move = []
-    for move in moves:
-        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move, directions)  # play and swap
-        score = -negamax(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, alpha, beta, heuristic, table,
-                         save_moves)[0]
+    best_move = None
+    ties = 0  # Number of moves with the best score
+    while legal:
+        move = legal & -legal  # get the least significant bit
+        legal ^= move  # remove the lsb
+        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move)  # play and swap
+        if leaf_children:  # Evaluate the leaf directly instead of recursing just to call the heuristic
+            score = -heuristic(new_own_pieces, new_enemy_pieces, size, table)
+        else:
+            score = -negamax(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, alpha, beta, heuristic, table,
+                             save_moves)[0]
 
         if score > best:
             best = score
-            best_move = [move]
-        elif score == best:
-            best_move.append(move)
-    return best, random.choice(best_move)
+            best_move = move
+            ties = 1
+        elif score == best:  # Keep one of the tied moves with a uniform probability (reservoir sampling)
+            ties += 1
+            if random.random() * ties < 1:
+                best_move = move
+    return best, best_move
 
 
 def negamax_alpha_beta(own_pieces: int, enemy_pieces: int, turn: int, depth: int, size: int, alpha: int, beta: int,
-                       heuristic, table=None, save_moves=None) -> tuple:
-    """Negamax version of the MinMax Algorithm with alpha-beta pruning. Only works for pair depth."""
+                       heuristic, table=None, save_moves=None, pv_hint=None, key=None) -> tuple:
+    """Negamax version of the MinMax Algorithm with alpha-beta pruning (principal variation search) and a
+    transposition table. Only works for pair depth.
+    The Zobrist key of the position is computed at the root, then updated by each move."""
     # End of the recursion : Max depth reached or no more possible moves
     if depth == MAX_DEPTH:
         return heuristic(own_pieces, enemy_pieces, size, table), None
-    moves, directions = generate_moves(own_pieces, enemy_pieces, size)
-    if not moves:
+
+    # Look for the position in the transposition table (except at the root, where a move must be returned)
+    if key is None:
+        key = zobrist_hash(own_pieces, enemy_pieces, turn)
+    remaining_depth = MAX_DEPTH - depth
+    alpha_orig = alpha
+    entry = transposition_table.get(key)
+    if entry is not None and depth > 0 and entry[1] >= remaining_depth:
+        value, _, flag, _ = entry
+        if flag == EXACT:
+            return value, None
+        if flag == LOWER_BOUND:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value, None
+
+    # Bit board of the possible moves : each move is extracted only when it is searched
+    legal = legal_moves_cached(own_pieces, enemy_pieces) if save_moves else legal_moves(own_pieces, enemy_pieces)
+    if not legal:
         return heuristic(own_pieces, enemy_pieces, size, table), None
 
-    best = -MAX_INT
-    best_move = []
-    for move in moves:
-        new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move, directions)  # play and swap
-        score = -negamax_alpha_beta(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, -beta, -alpha, heuristic,
-                                    table, save_moves)[0]
+    if pv_hint is None and entry is not None:  # The best move of a previous search of the position is searched first
+        pv_hint = entry[3]
 
-        if score == best:
-            best_move.append(move)
+    leaf_children = depth + 1 == MAX_DEPTH  # The children are at the frontier of the search
+    # A child searched with the window (alpha, beta) only returns a bound when its score is alpha. At the root, where a
+    # move tied with the best one can be chosen, the window is widened by one so that a score equal to alpha is exact.
+    tie_margin = 1 if depth == 0 else 0
+    first_child = True
+    best = -MAX_INT
+    best_move = None
+    ties = 0  # Number of moves with the best score
+    while legal:
+        move = pv_hint or legal & -legal  # Search first the best move of a previous search, then the lsb
+        pv_hint = None
+        legal ^= move  # remove the move
+        if leaf_children:  # Evaluate the leaf directly instead of recursing just to call the heuristic
+            new_enemy_pieces, new_own_pieces = make_move(own_pieces, enemy_pieces, move)  # play and swap
+            score = -heuristic(new_own_pieces, new_enemy_pieces, size, table)
+        else:
+            new_enemy_pieces, new_own_pieces, new_key = make_move_zobrist(own_pieces, enemy_pieces, move, key, turn)
+            if first_child:  # Principal variation : search with the full window
+                first_child = False
+                score = -negamax_alpha_beta(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, -beta,
+                                            -alpha + tie_margin, heuristic, table, save_moves, key=new_key)[0]
+            else:  # Only prove that the move is not better than the principal variation, with a null window
+                score = -negamax_alpha_beta(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, -alpha - 1,
+                                            -alpha + tie_margin, heuristic, table, save_moves, key=new_key)[0]
+                if alpha < score < beta:  # The move is better : search it again with the full window
+                    score = -negamax_alpha_beta(new_own_pieces, new_enemy_pieces, -turn, depth + 1, size, -beta,
+                                                -alpha + tie_margin, heuristic, table, save_moves, key=new_key)[0]
+
+        if score == best:  # Keep one of the tied moves with a uniform probability (reservoir sampling)
+            ties += 1
+            if random.random() * ties < 1:
+                best_move = move
         elif score > best:
             best = score
-            best_move = [move]
+            best_move = move
+            ties = 1
             if best > alpha:
                 alpha = best
-                if alpha > beta:
+                if alpha >= beta:
                     break
-    return best, random.choice(best_move)
+
+    # Save the result : exact if it is inside the window, else it is only a bound
+    if best <= alpha_orig:
+        flag = UPPER_BOUND
+    elif best >= beta:
+        flag = LOWER_BOUND
+    else:
+        flag = EXACT
+    store_transposition(key, best, remaining_depth, flag, best_move)
+    return best, best_move
+
+
+def store_transposition(key: int, value: int, remaining_depth: int, flag: int, best_move: int) -> None:
+    """Store an entry in the transposition table, only replacing entries searched less deeply.
+    New positions are not stored anymore once the table is full."""
+    entry = transposition_table.get(key)
+    if entry is None:
+        if len(transposition_table) >= TT_MAX_SIZE:
+            return
+    elif entry[1] > remaining_depth:
+        return
+    transposition_table[key] = (value, remaining_depth, flag, best_move)